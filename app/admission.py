@@ -0,0 +1,49 @@
+import asyncio
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    """Fila de admissão cheia: a requisição deve ser recusada (503)."""
+
+
+class AdmissionController:
+    """
+    Limita quantas decisões rodam ao mesmo tempo (`max_concurrent`)
+    e quantas podem esperar por uma vaga (`max_queued`).
+
+    Quem chega com a fila cheia recebe QueueFullError imediatamente,
+    em vez de se acumular no threadpool aumentando a latência de todos.
+    Deve ser usado apenas a partir do event loop.
+    """
+
+    def __init__(self, max_concurrent: int = 1, max_queued: int = 8):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._pending = 0  # rodando + aguardando
+
+    @property
+    def in_flight(self) -> int:
+        return self._pending
+
+    @contextmanager
+    def admit(self):
+        # event loop é single-thread: contador sem lock
+        if self._pending >= self.max_concurrent + self.max_queued:
+            raise QueueFullError()
+        self._pending += 1
+        try:
+            yield self
+        finally:
+            self._pending -= 1
+
+    async def acquire(self, timeout: float) -> bool:
+        """Aguarda uma vaga de execução; False se o timeout estourar."""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(timeout, 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def release(self) -> None:
+        self._slots.release()
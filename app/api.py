@@ -1,17 +1,46 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-import logging, time
+import asyncio, hmac, logging, threading, time
 
 from .models import Processo, DecisionResult
 from .decision_service import DecisionEngine
+from .admission import AdmissionController, QueueFullError
+from .profiling import build_profiler
+from .config import (
+    REQUEST_TIMEOUT_S,
+    MAX_REQUEST_TIMEOUT_S,
+    MAX_CONCURRENT_DECISIONS,
+    MAX_QUEUED_DECISIONS,
+    RETRY_AFTER_S,
+    PROFILING_ADMIN_TOKEN,
+)
 
 logger = logging.getLogger("jus-validator")
 
+# intervalo para checar se o cliente desconectou
+DISCONNECT_POLL_S = 0.5
+# status (nginx) para requisição abandonada pelo cliente
+CLIENT_CLOSED_REQUEST = 499
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # grava os spans ainda no buffer antes de encerrar
+    exporter = decision_engine.tracer.exporter
+    if exporter is not None:
+        await run_in_threadpool(exporter.close)
+
+
 app = FastAPI(
     title="Credit Validator",
     version="0.1.0",
     description="API para validação de processos judiciais com IA (RAG + LLM local).",
+    lifespan=lifespan,
 )
 
 # CORS simples 
@@ -25,6 +54,12 @@ app.add_middleware(
 
 # instancia engine
 decision_engine = DecisionEngine()
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_DECISIONS,
+    max_queued=MAX_QUEUED_DECISIONS,
+)
+# None quando PROFILING_ENABLED=false: sem rotas /debug e sem medição
+profiler = build_profiler()
 
 
 @app.get("/health")
@@ -32,25 +67,174 @@ def health():
     return {"status": "ok"}
 
 
+def _resolve_timeout(header_value: Optional[float]) -> float:
+    """
+    Timeout efetivo: header X-Request-Timeout (se válido) limitado
+    por MAX_REQUEST_TIMEOUT_S; senão o padrão REQUEST_TIMEOUT_S.
+    """
+    if header_value is None or header_value <= 0:
+        return REQUEST_TIMEOUT_S
+    return min(header_value, MAX_REQUEST_TIMEOUT_S)
+
+
+async def _wait_watching_client(task: asyncio.Future, request: Request) -> bool:
+    """
+    Espera `task` terminar. Retorna False se o cliente desconectar antes.
+    """
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_S)
+        if done:
+            return True
+        if await request.is_disconnected():
+            return False
+
+
+def _run_decide(processo: Processo, deadline: float, cancel_event: threading.Event) -> Tuple[DecisionResult, dict]:
+    """
+    Roda decide no threadpool; com profiling ligado também mede
+    pico de memória/latência (e perfil de CPU, se armado).
+    """
+    if profiler is None:
+        return decision_engine.decide(processo, deadline, cancel_event), {}
+    return profiler.run(decision_engine.decide, processo, deadline, cancel_event)
+
+
+async def _decide_with_deadline(
+    processo: Processo,
+    request: Request,
+    deadline: float,
+) -> Tuple[Optional[DecisionResult], dict]:
+    """
+    Aguarda vaga na fila e roda a decisão respeitando o deadline.
+    Retorna (None, {}) se o cliente desconectou (trabalho cancelado);
+    o dict traz as métricas de profiling da requisição (vazio se desligado).
+    """
+    acquire = asyncio.ensure_future(admission.acquire(deadline - time.monotonic()))
+    if not await _wait_watching_client(acquire, request):
+        # cancela o trabalho ainda na fila
+        acquire.cancel()
+        try:
+            acquired = await acquire
+        except asyncio.CancelledError:
+            acquired = False
+        if acquired:
+            admission.release()
+        return None, {}
+
+    if not acquire.result():
+        # deadline estourou esperando vaga
+        return decision_engine.timeout_result(), {}
+
+    cancel_event = threading.Event()
+    try:
+        task = asyncio.ensure_future(
+            run_in_threadpool(_run_decide, processo, deadline, cancel_event)
+        )
+        if not await _wait_watching_client(task, request):
+            # interrompe a geração no próximo token e libera a vaga ao terminar
+            cancel_event.set()
+            await task
+            return None, {}
+        return task.result()
+    finally:
+        admission.release()
+
+
 @app.post("/validate_process", response_model=DecisionResult)
-def validate_process(processo: Processo):
+async def validate_process(
+    processo: Processo,
+    request: Request,
+    x_request_timeout: Optional[float] = Header(None),
+):
     """
     Recebe um processo e retorna a decisão de compra de crédito
     (approved | rejected | incomplete), com justificativa e citações da política.
+
+    O header `X-Request-Timeout` (segundos) define o deadline; se estourar,
+    a decisão é `incomplete`. Com a fila cheia responde 503 + Retry-After.
     """
     start = time.time()
-    result = decision_engine.decide(processo)
+    timeout = _resolve_timeout(x_request_timeout)
+    deadline = time.monotonic() + timeout
+
+    try:
+        with admission.admit():
+            result, profile_stats = await _decide_with_deadline(processo, request, deadline)
+    except QueueFullError:
+        logger.warning(
+            "request_rejected_queue_full",
+            extra={"numeroProcesso": processo.numeroProcesso, "in_flight": admission.in_flight},
+        )
+        raise HTTPException(
+            status_code=503,
+            detail="Fila de validação cheia, tente novamente mais tarde.",
+            headers={"Retry-After": str(RETRY_AFTER_S)},
+        )
+
     elapsed = time.time() - start
+    if result is None:
+        logger.info(
+            "client_disconnected",
+            extra={"numeroProcesso": processo.numeroProcesso, "latency_s": round(elapsed, 3)},
+        )
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
     logger.info(
         "decision_made",
         extra={
             "numeroProcesso": processo.numeroProcesso,
             "decision": result.decision,
+            "timed_out": result.timed_out,
             "citacoes": result.citacoes,
             "model": result.model_name,
             "prompt_version": result.prompt_version,
             "policy_kb_version": result.policy_kb_version,
+            "timeout_s": timeout,
+            "doc_store_hit_rate": (
+                round(decision_engine.doc_store.hit_rate, 4)
+                if decision_engine.doc_store is not None else None
+            ),
             "latency_s": round(elapsed, 3),
+            **profile_stats,
         },
     )
-    return result
\ No newline at end of file
+    return result
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
+
+
+if profiler is not None and not PROFILING_ADMIN_TOKEN:
+    logger.warning("profiling_endpoints_disabled: defina PROFILING_ADMIN_TOKEN para expor /debug/*")
+
+# endpoints de profiling: só existem com PROFILING_ENABLED=true e PROFILING_ADMIN_TOKEN definido
+if profiler is not None and PROFILING_ADMIN_TOKEN:
+    debug = APIRouter(prefix="/debug", tags=["debug"], dependencies=[Depends(_require_admin)])
+
+    @debug.get("/memory")
+    def debug_memory(top: int = 20):
+        """
+        Diff do tracemalloc desde a última chamada, RSS, memória do torch
+        e pico de memória das últimas requisições.
+        """
+        return profiler.memory_report(top=top)
+
+    @debug.post("/cpu_profile")
+    def debug_arm_cpu_profile(n: int = 5):
+        """
+        Gera perfis de CPU (formato folded, para flamegraph) das próximas `n` decisões.
+        """
+        profiler.arm_cpu_profile(n)
+        return {"armed": profiler.profiles_left, "profile_dir": profiler.profile_dir}
+
+    @debug.get("/cpu_profile")
+    def debug_list_cpu_profiles():
+        return {
+            "pending": profiler.profiles_left,
+            "profile_dir": profiler.profile_dir,
+            "files": profiler.list_profiles(),
+        }
+
+    app.include_router(debug)
@@ -18,3 +18,72 @@ EMBEDDING_MODEL_NAME: str = os.getenv(
 # versionamento
 PROMPT_VERSION: str = "v1.0.0"
 POLICY_KB_VERSION: str = "2025-01"
+
+# tracing local: "off" | "sampled" | "full"
+TRACING_MODE: str = os.getenv("TRACING_MODE", "off").lower()
+TRACING_SAMPLE_RATE: float = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+# .jsonl -> arquivo JSON lines; .db/.sqlite -> SQLite
+TRACE_PATH: str = os.getenv("TRACE_PATH", "traces/decide.jsonl")
+# spans em memória aguardando escrita; se encher, descarta (não bloqueia)
+TRACE_BUFFER_SIZE: int = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+# exportar também para o LangSmith (exige rede)
+LANGSMITH_TRACING: bool = os.getenv("LANGSMITH_TRACING", "false").lower() == "true"
+
+# deadlines e controle de admissão da API
+# tempo máximo por requisição (s); pode ser reduzido pelo header X-Request-Timeout
+REQUEST_TIMEOUT_S: float = float(os.getenv("REQUEST_TIMEOUT_S", "180"))
+MAX_REQUEST_TIMEOUT_S: float = float(os.getenv("MAX_REQUEST_TIMEOUT_S", "600"))
+# decisões rodando ao mesmo tempo no modelo
+MAX_CONCURRENT_DECISIONS: int = int(os.getenv("MAX_CONCURRENT_DECISIONS", "1"))
+# requisições aguardando vaga; acima disso a API responde 503 + Retry-After
+MAX_QUEUED_DECISIONS: int = int(os.getenv("MAX_QUEUED_DECISIONS", "8"))
+RETRY_AFTER_S: int = int(os.getenv("RETRY_AFTER_S", "30"))
+
+# UI (streamlit): envio em lote
+UI_MAX_CONCURRENCY: int = int(os.getenv("UI_MAX_CONCURRENCY", "4"))
+UI_HEALTH_TTL_S: int = int(os.getenv("UI_HEALTH_TTL_S", "15"))
+
+# backend de embeddings: "torch" (sentence-transformers) | "onnx" | "onnx-int8"
+EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# onde o modelo exportado para ONNX é guardado (exportado na primeira carga)
+ONNX_CACHE_DIR: str = os.getenv("ONNX_CACHE_DIR", "models/onnx")
+EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_NUM_THREADS: int = int(os.getenv("EMBEDDING_NUM_THREADS", "4"))
+
+# modo de decisão: "summary" (resumo único) | "hierarchical" (digest por documento + decisão)
+DECISION_MODE: str = os.getenv("DECISION_MODE", "summary").lower()
+DIGEST_PROMPT_VERSION: str = "d1.0.0"
+# documentos com texto até este tamanho entram inteiros no prompt final
+DIGEST_MIN_CHARS: int = int(os.getenv("DIGEST_MIN_CHARS", "1500"))
+# tamanho máximo de cada trecho enviado ao modelo para condensar
+DIGEST_CHUNK_CHARS: int = int(os.getenv("DIGEST_CHUNK_CHARS", "6000"))
+# trechos condensados por chamada em lote ao modelo (também o batch_size do pipeline)
+DIGEST_BATCH_SIZE: int = int(os.getenv("DIGEST_BATCH_SIZE", "4"))
+# tamanho máximo do digest de um documento; acima disso os resumos parciais
+# são condensados de novo (até DIGEST_MAX_ROUNDS rodadas, depois corte)
+DIGEST_MAX_CHARS: int = int(os.getenv("DIGEST_MAX_CHARS", "1500"))
+DIGEST_MAX_ROUNDS: int = int(os.getenv("DIGEST_MAX_ROUNDS", "3"))
+# limite do resumo do processo (+ conteúdo dos documentos) no prompt final
+MAX_SUMMARY_CHARS: int = int(os.getenv("MAX_SUMMARY_CHARS", "12000"))
+
+# indícios por regex no texto dos documentos (ex.: "substabelecimento sem reserva")
+# adicionados ao resumo do processo; heurístico, por isso desligado por padrão
+DOC_FLAGS_ENABLED: bool = os.getenv("DOC_FLAGS_ENABLED", "false").lower() == "true"
+DOC_FLAGS_VERSION: str = "f1.0.0"
+
+# store endereçado por conteúdo dos textos de documentos (artefatos por documento)
+# padrão: ligado só no modo hierárquico, onde guarda os digests (chamadas ao LLM)
+DOC_STORE_ENABLED: bool = os.getenv(
+    "DOC_STORE_ENABLED",
+    "true" if DECISION_MODE == "hierarchical" else "false",
+).lower() == "true"
+DOC_STORE_DIR: str = os.getenv("DOC_STORE_DIR", "cache/doc_store")
+DOC_STORE_MAX_MB: int = int(os.getenv("DOC_STORE_MAX_MB", "512"))
+
+# profiling (opt-in): endpoints /debug/*, tracemalloc e perfis de CPU por amostragem
+PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# se definido, os endpoints /debug/* exigem o header X-Admin-Token
+PROFILING_ADMIN_TOKEN: str = os.getenv("PROFILING_ADMIN_TOKEN", "")
+PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL_S: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL_S", "0.005"))
+TRACEMALLOC_FRAMES: int = int(os.getenv("TRACEMALLOC_FRAMES", "10"))
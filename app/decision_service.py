@@ -1,25 +1,53 @@
 import json
-from typing import List
+import threading
+from typing import Dict, List, Optional
 
 from langchain_core.prompts import PromptTemplate
+from transformers import StoppingCriteriaList
 
 import re
 from json import JSONDecodeError
 from .models import Processo, DecisionResult
 from .rag import build_policy_retriever
-from .llm import build_local_llm
-from .config import PROMPT_VERSION, POLICY_KB_VERSION, LOCAL_LLM_MODEL
-import os
-from langsmith import traceable
-
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_PROJECT"] = "default"
-
-
-def summarize_processo(processo: Processo) -> str:
+from .llm import build_local_llm, DeadlineStoppingCriteria
+from .config import (
+    PROMPT_VERSION,
+    POLICY_KB_VERSION,
+    LOCAL_LLM_MODEL,
+    LANGSMITH_TRACING,
+    DOC_FLAGS_ENABLED,
+    DOC_FLAGS_VERSION,
+    DECISION_MODE,
+    DIGEST_PROMPT_VERSION,
+    DIGEST_MIN_CHARS,
+    DIGEST_CHUNK_CHARS,
+    DIGEST_BATCH_SIZE,
+    DIGEST_MAX_CHARS,
+    DIGEST_MAX_ROUNDS,
+    MAX_SUMMARY_CHARS,
+)
+from .tracing import build_tracer
+from .documents import FLAG_LABELS, normalize_text, text_hash, chunk_boundaries, extract_flags
+from .doc_store import DocumentArtifacts, build_document_store
+
+# LangSmith só quando explicitamente habilitado (exporta pela rede)
+if LANGSMITH_TRACING:
+    from langsmith import traceable
+else:
+    def traceable(fn):
+        return fn
+
+
+def summarize_processo(
+    processo: Processo,
+    doc_flags: Optional[Dict[str, List[str]]] = None,
+) -> str:
     """
     Cria um resumo textual do processo para usar como query no RAG
     e também no prompt do LLM.
+
+    `doc_flags` (id do documento -> indícios extraídos do texto) entra
+    como uma seção extra do resumo.
     """
     doc_nomes = [d.nome for d in processo.documentos]
     mov_descs = [m.descricao for m in processo.movimentos]  # podemos limitar o tamanho aqui [:5]
@@ -40,6 +68,15 @@ def summarize_processo(processo: Processo) -> str:
         "Primeiros movimentos registrados:",
         *[f"- {d}" for d in mov_descs],
     ]
+
+    if doc_flags:
+        flagged = [
+            f"- {d.nome}: " + "; ".join(FLAG_LABELS[f] for f in doc_flags[d.id])
+            for d in processo.documentos
+            if doc_flags.get(d.id)
+        ]
+        if flagged:
+            lines += ["", "Indícios encontrados no texto dos documentos:", *flagged]
     return "\n".join(lines)
 
 
@@ -73,9 +110,46 @@ NÃO mostre exemplo.
 """
 
 
+DIGEST_PROMPT = """
+Você é um assistente jurídico que prepara documentos para análise de compra de créditos.
+
+Resuma o trecho de documento abaixo em no máximo 5 tópicos curtos, em português,
+mantendo APENAS informações relevantes para a política:
+- trânsito em julgado e fase de execução / cumprimento de sentença;
+- valor da condenação e esfera (ex.: trabalhista);
+- óbito do autor e habilitação de herdeiros/sucessores;
+- substabelecimento com ou sem reserva de poderes;
+- honorários contratuais, periciais e sucumbenciais.
+
+Se o trecho não tiver nada disso, responda apenas: "Sem informações relevantes."
+
+DOCUMENTO: {nome} (parte {parte} de {total})
+{texto}
+
+RESUMO:
+"""
+
+
+def split_for_digest(text: str, size: int = DIGEST_CHUNK_CHARS) -> List[str]:
+    """
+    Divide um texto longo em trechos de até `size` caracteres,
+    cortando preferencialmente em espaço.
+    """
+    parts = [text[s:e] for s, e in chunk_boundaries(text, size=size, overlap=0)]
+    return parts or [text]
+
+
 
 class DecisionEngine:
-    def __init__(self, llm=None, retriever=None):
+    def __init__(
+        self,
+        llm=None,
+        retriever=None,
+        tracer=None,
+        doc_store=None,
+        mode: Optional[str] = None,
+        doc_flags: Optional[bool] = None,
+    ):
         # llm local
         self.llm = llm or build_local_llm()
         # faiss retriever
@@ -85,6 +159,58 @@ class DecisionEngine:
             input_variables=["policy_context", "process_summary"],
             template=DECISION_PROMPT,
         )
+        # tracing local (off / sampled / full)
+        self.tracer = tracer or build_tracer()
+        # artefatos por documento, compartilhados entre processos (hash do texto)
+        self.doc_store = doc_store or build_document_store()
+        # indícios por regex no resumo (opt-in, muda o prompt)
+        self.doc_flags = DOC_FLAGS_ENABLED if doc_flags is None else doc_flags
+        # "summary" ou "hierarchical" (digest por documento antes da decisão)
+        self.mode = (mode or DECISION_MODE).lower()
+        if self.mode not in {"summary", "hierarchical"}:
+            raise ValueError(f"DECISION_MODE inválido: {self.mode!r} (use 'summary' ou 'hierarchical')")
+        self.digest_prompt = PromptTemplate(
+            input_variables=["nome", "parte", "total", "texto"],
+            template=DIGEST_PROMPT,
+        )
+
+    @staticmethod
+    def _process_document(text: str) -> DocumentArtifacts:
+        """
+        Trabalho por documento: indícios extraídos do texto.
+        """
+        return DocumentArtifacts(flags=extract_flags(normalize_text(text)))
+
+    @property
+    def prompt_version(self) -> str:
+        """Versão efetiva do prompt para o modo/opções desta engine."""
+        version = PROMPT_VERSION
+        if self.doc_flags:
+            version += f"+{DOC_FLAGS_VERSION}"
+        if self.mode == "hierarchical":
+            version += f"+{DIGEST_PROMPT_VERSION}"
+        return version
+
+    def _analyze_documentos(self, processo: Processo) -> Dict[str, DocumentArtifacts]:
+        """
+        Artefatos de cada documento (por id). Consulta o doc_store antes de
+        processar; textos repetidos no mesmo processo são processados uma vez.
+        """
+        by_hash: Dict[str, DocumentArtifacts] = {}
+        result: Dict[str, DocumentArtifacts] = {}
+        for doc in processo.documentos:
+            if not doc.texto.strip():
+                continue
+            key = text_hash(doc.texto)
+            if key not in by_hash:
+                if self.doc_store is not None:
+                    by_hash[key] = self.doc_store.get_or_compute(
+                        key, lambda: self._process_document(doc.texto)
+                    )
+                else:
+                    by_hash[key] = self._process_document(doc.texto)
+            result[doc.id] = by_hash[key]
+        return result
 
     def _build_policy_context(self, process_summary: str) -> str:
         """
@@ -189,38 +315,249 @@ class DecisionEngine:
         return DecisionEngine._heuristic_from_text(raw_text)
 
 
+    def timeout_result(self) -> DecisionResult:
+        """
+        Resultado padrão quando o deadline estoura ou a requisição é cancelada
+        antes de o modelo terminar: nunca devolvemos decisão parcial.
+        Usa o mesmo prompt_version das respostas normais deste modo.
+        """
+        return DecisionResult(
+            decision="incomplete",
+            rationale="Tempo limite de análise excedido antes de o modelo concluir. O processo deve ser reenviado ou revisado manualmente.",
+            citacoes=[],
+            timed_out=True,
+            model_name=LOCAL_LLM_MODEL,
+            prompt_version=self.prompt_version,
+            policy_kb_version=POLICY_KB_VERSION,
+        )
+
+    @staticmethod
+    def _llm_kwargs(criteria: Optional[DeadlineStoppingCriteria]) -> dict:
+        if criteria is None:
+            return {}
+        # HuggingFacePipeline repassa pipeline_kwargs para generate()
+        return {"pipeline_kwargs": {"stopping_criteria": StoppingCriteriaList([criteria])}}
+
+    def _invoke_llm(self, prompt_str: str, criteria: Optional[DeadlineStoppingCriteria]) -> str:
+        return self.llm.invoke(prompt_str, **self._llm_kwargs(criteria))
+
+    def _build_digests(
+        self,
+        processo: Processo,
+        criteria: Optional[DeadlineStoppingCriteria],
+    ) -> Optional[Dict[str, str]]:
+        """
+        Map-reduce do modo hierárquico: condensa cada documento longo em
+        um digest focado na política (id do documento -> digest).
+
+        - map: o texto é dividido em trechos de DIGEST_CHUNK_CHARS e cada
+          trecho vira um resumo parcial;
+        - reduce: os parciais são juntados e, se passarem de DIGEST_MAX_CHARS,
+          condensados de novo (até DIGEST_MAX_ROUNDS rodadas; depois corte).
+
+        Os prompts de todos os documentos vão ao modelo em lotes de
+        DIGEST_BATCH_SIZE. Cada digest é gravado no doc_store (hash do texto +
+        DIGEST_PROMPT_VERSION) assim que o documento termina, então um
+        timeout no meio não perde o que já foi feito. Retorna None se o
+        deadline estourar.
+        """
+        digests: Dict[str, str] = {}
+        names: Dict[str, str] = {}
+        doc_keys: Dict[str, str] = {}
+        # hash -> trechos da rodada atual
+        state: Dict[str, List[str]] = {}
+
+        for doc in processo.documentos:
+            text = normalize_text(doc.texto)
+            if len(text) <= DIGEST_MIN_CHARS:
+                continue
+            key = text_hash(doc.texto)
+            doc_keys[doc.id] = key
+            if key in digests or key in state:
+                continue
+            cached = None
+            if self.doc_store is not None:
+                cached = self.doc_store.get_digest(key, DIGEST_PROMPT_VERSION)
+            if cached is not None:
+                digests[key] = cached
+            else:
+                state[key] = split_for_digest(text)
+                names[key] = doc.nome
+
+        def finish_round(key: str, outputs: List[str], round_no: int) -> Optional[List[str]]:
+            """Fecha a rodada de um documento; devolve os trechos da próxima, se houver."""
+            joined = "\n".join(o.strip() for o in outputs)
+            if len(joined) > DIGEST_MAX_CHARS and round_no < DIGEST_MAX_ROUNDS:
+                return split_for_digest(joined)
+            digest = joined[:DIGEST_MAX_CHARS]
+            digests[key] = digest
+            if self.doc_store is not None:
+                self.doc_store.put_digest(key, DIGEST_PROMPT_VERSION, digest)
+            return None
+
+        round_no = 0
+        while state:
+            round_no += 1
+            jobs = []  # (hash, prompt), trechos do mesmo documento contíguos
+            for key, parts in state.items():
+                nome = names[key] if round_no == 1 else f"{names[key]} (resumos parciais)"
+                for i, part in enumerate(parts, start=1):
+                    jobs.append((key, self.digest_prompt.format(
+                        nome=nome, parte=i, total=len(parts), texto=part,
+                    )))
+
+            outputs: Dict[str, List[str]] = {key: [] for key in state}
+            next_state: Dict[str, List[str]] = {}
+            for start in range(0, len(jobs), DIGEST_BATCH_SIZE):
+                if criteria is not None and criteria.expired():
+                    return None
+                batch = jobs[start:start + DIGEST_BATCH_SIZE]
+                results = self.llm.batch([prompt for _, prompt in batch], **self._llm_kwargs(criteria))
+                if criteria is not None and criteria.triggered:
+                    # parciais truncados não são usados
+                    return None
+                for (key, _), out in zip(batch, results):
+                    outputs[key].append(out)
+                    if len(outputs[key]) == len(state[key]):
+                        parts = finish_round(key, outputs[key], round_no)
+                        if parts is not None:
+                            next_state[key] = parts
+            state = next_state
+
+        return {doc_id: digests[key] for doc_id, key in doc_keys.items()}
+
+    @staticmethod
+    def _documents_section(processo: Processo, digests: Dict[str, str], budget: int) -> str:
+        """
+        Conteúdo dos documentos para o prompt final do modo hierárquico:
+        digest dos longos, texto integral dos curtos, limitado a `budget`
+        caracteres (o que não couber é cortado/omitido e sinalizado).
+        """
+        header = "Conteúdo dos documentos (longos resumidos):"
+        remaining = budget - len(header)
+        blocks = []
+        omitted = 0
+        for doc in processo.documentos:
+            if doc.id in digests:
+                body = digests[doc.id]
+            else:
+                body = normalize_text(doc.texto)
+            if not body:
+                continue
+            block = f"### {doc.nome}\n{body}"
+            if remaining <= len(f"### {doc.nome}\n") + 100:
+                omitted += 1
+                continue
+            if len(block) + 2 > remaining:
+                block = block[:remaining - 8] + " [...]"
+            blocks.append(block)
+            remaining -= len(block) + 2
+        if not blocks:
+            return ""
+        if omitted:
+            blocks.append(f"({omitted} documento(s) omitido(s) por limite de contexto)")
+        return header + "\n\n" + "\n\n".join(blocks)
+
     @traceable
-    def decide(self, processo: Processo) -> DecisionResult:
+    def decide(
+        self,
+        processo: Processo,
+        deadline: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> DecisionResult:
         """
         Ponto único de decisão:
+        - opcional (DOC_FLAGS_ENABLED): extrai indícios do texto dos documentos,
+        - no modo hierárquico, condensa documentos longos em digests,
         - sumariza o processo,
         - usa RAG para pegar as políticas relevantes,
         - monta o prompt,
         - chama o LLM local via LangChain,
         - parseia o JSON e retorna DecisionResult.
+
+        `deadline` (time.monotonic) e `cancel_event` abortam a geração;
+        nesse caso retorna `incomplete` com `timed_out=True` (ver timeout_result).
         """
-        process_summary = summarize_processo(processo)
-        policy_context = self._build_policy_context(process_summary)
+        criteria = None
+        if deadline is not None or cancel_event is not None:
+            criteria = DeadlineStoppingCriteria(deadline, cancel_event)
+
+        span = self.tracer.start_span("decide")
+        span.set("numeroProcesso", processo.numeroProcesso)
+        try:
+            return self._decide(processo, criteria, span)
+        except Exception as e:
+            # falhas (retriever, LLM, parse) também vão para o trace
+            span.set("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self.tracer.finish(span)
+
+    def _decide(
+        self,
+        processo: Processo,
+        criteria: Optional[DeadlineStoppingCriteria],
+        span,
+    ) -> DecisionResult:
+        doc_flags = None
+        if self.doc_flags:
+            with span.stage("documents"):
+                artifacts = self._analyze_documentos(processo)
+            doc_flags = {doc_id: a.flags for doc_id, a in artifacts.items()}
+
+        with span.stage("summarize"):
+            process_summary = summarize_processo(processo, doc_flags)
+        with span.stage("retrieve"):
+            policy_context = self._build_policy_context(process_summary)
+
+        if self.mode == "hierarchical":
+            with span.stage("digest"):
+                digests = self._build_digests(processo, criteria)
+            if digests is None:
+                span.set("timed_out", True)
+                return self.timeout_result()
+            span.set("digests", len(digests))
+            budget = MAX_SUMMARY_CHARS - len(process_summary) - 2
+            section = self._documents_section(processo, digests, budget) if budget > 0 else ""
+            if section:
+                process_summary = f"{process_summary}\n\n{section}"
+
+        # impedir estouro de contexto
+        if len(process_summary) > MAX_SUMMARY_CHARS:
+            process_summary = process_summary[:MAX_SUMMARY_CHARS] + " [...]"
+            span.set("summary_truncated", True)
 
         prompt_str = self.prompt.format(
             policy_context=policy_context,
             process_summary=process_summary,
         )
-        
-        # impedir estouro de contexto
-        
-        #if len(prompt_str) > MAX_PROMPT_CHARS:
-        #    prompt_str = prompt_str[:MAX_PROMPT_CHARS]
+        span.set("prompt", prompt_str)
+
+
+        # tempo já esgotado (ex.: esperando na fila) -> nem chama o modelo
+        if criteria is not None and criteria.expired():
+            span.set("timed_out", True)
+            return self.timeout_result()
+
+        with span.stage("generate"):
+            raw_output = self._invoke_llm(prompt_str, criteria)
+        span.set("raw_output", raw_output)
 
-        raw_output = self.llm.invoke(prompt_str)
+        if criteria is not None and criteria.triggered:
+            span.set("timed_out", True)
+            return self.timeout_result()
 
-        data = self._parse_json_output(raw_output)
+        with span.stage("parse"):
+            data = self._parse_json_output(raw_output)
+        span.set("decision", data.get("decision"))
+        if self.doc_store is not None:
+            span.set("doc_store", self.doc_store.stats())
 
         return DecisionResult(
             decision=data["decision"],
             rationale=data["rationale"],
             citacoes=data.get("citacoes", []),
             model_name=LOCAL_LLM_MODEL,
-            prompt_version=PROMPT_VERSION,
+            prompt_version=self.prompt_version,
             policy_kb_version=POLICY_KB_VERSION,
         )
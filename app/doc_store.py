@@ -0,0 +1,317 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from .config import DOC_STORE_ENABLED, DOC_STORE_DIR, DOC_STORE_MAX_MB
+
+
+# muda quando o formato ou a extração mudam: entradas antigas viram miss
+ARTIFACTS_VERSION = 2
+
+
+@dataclass
+class DocumentArtifacts:
+    """
+    Artefatos derivados de um texto de documento (hoje, os indícios
+    extraídos por regex; os digests têm API própria).
+    """
+
+    flags: List[str] = field(default_factory=list)
+
+
+class DocumentStore:
+    """
+    Store local endereçado por conteúdo (sha256 do texto normalizado).
+
+    Layout: <root>/<hh>/<hash>/{meta.json, digest-<versão>.txt}. Mantém um índice
+    LRU em memória e remove as entradas menos usadas quando o total passa
+    de `max_bytes`. Seguro para uso a partir de várias threads.
+
+    O diretório pode ser compartilhado por vários processos (workers/pods):
+    entradas gravadas por outro processo são encontradas no disco e
+    incorporadas ao índice. O limite de tamanho, porém, é aplicado por
+    processo, sobre as entradas que ele conhece.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.digest_hits = 0
+        self.digest_misses = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # hash -> bytes
+        self._total_bytes = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+
+    def _load_index(self) -> None:
+        entries = []
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith("."):
+                    # temporário de um put interrompido (ou em andamento em outro worker)
+                    self._remove_stale_tmp(entry.path)
+                    continue
+                meta = os.path.join(entry.path, "meta.json")
+                if entry.is_dir() and os.path.exists(meta):
+                    entries.append((os.path.getmtime(meta), entry.name, self._dir_size(entry.path)))
+        # mais antigo primeiro = primeiro a sair
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def _remove_stale_tmp(path: str, max_age_s: float = 3600) -> None:
+        try:
+            if time.time() - os.path.getmtime(path) < max_age_s:
+                return
+        except OSError:
+            return
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _index_from_disk(self, key: str) -> bool:
+        """
+        Incorpora ao índice uma entrada que já existe no disco
+        (ex.: gravada por outro worker). False se ela não existir.
+        """
+        path = self._entry_dir(key)
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return False
+        try:
+            size = self._dir_size(path)
+        except OSError:
+            return False
+        with self._lock:
+            if key in self._index:
+                return True
+            self._index[key] = size
+            self._total_bytes += size
+            evict = self._select_evictions()
+        for old in evict:
+            shutil.rmtree(self._entry_dir(old), ignore_errors=True)
+        return True
+
+    def get(self, key: str) -> Optional[DocumentArtifacts]:
+        with self._lock:
+            known = key in self._index
+            if known:
+                self._index.move_to_end(key)
+        if not known and not self._index_from_disk(key):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        path = self._entry_dir(key)
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            # mtime do meta marca o último uso (recupera a ordem LRU no restart)
+            os.utime(os.path.join(path, "meta.json"))
+        except (OSError, ValueError):
+            # entrada removida/corrompida por outro processo
+            self._forget(key)
+            return None
+
+        if meta.get("version") != ARTIFACTS_VERSION:
+            self._forget(key)
+            return None
+
+        if "flags" not in meta:
+            # entrada criada só para digests: indícios ainda não calculados
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return DocumentArtifacts(flags=meta["flags"])
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict) -> None:
+        # arquivo temporário + os.replace: leitores nunca veem meta.json parcial
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".meta-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _ensure_entry(self, key: str) -> bool:
+        """
+        Garante que a entrada existe (no disco e no índice), criando-a
+        vazia se preciso. False se não foi possível criar.
+        """
+        with self._lock:
+            if key in self._index:
+                return True
+        if self._index_from_disk(key):
+            return True
+
+        final = self._entry_dir(key)
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        # escreve num diretório temporário e renomeia (atômico)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(final), prefix=".tmp-")
+        try:
+            self._write_meta(
+                os.path.join(tmp, "meta.json"),
+                {"version": ARTIFACTS_VERSION, "created_at": time.time()},
+            )
+            os.rename(tmp, final)
+        except OSError:
+            # outra thread/processo criou a mesma entrada
+            shutil.rmtree(tmp, ignore_errors=True)
+            return self._index_from_disk(key)
+        return self._index_from_disk(key)
+
+    def _refresh_size(self, key: str) -> None:
+        """Atualiza o tamanho da entrada no índice e aplica o limite."""
+        try:
+            size = self._dir_size(self._entry_dir(key))
+        except OSError:
+            return
+        with self._lock:
+            if key not in self._index:
+                return
+            self._total_bytes += size - self._index[key]
+            self._index[key] = size
+            self._index.move_to_end(key)
+            evict = self._select_evictions()
+        for old in evict:
+            shutil.rmtree(self._entry_dir(old), ignore_errors=True)
+
+    def put(self, key: str, artifacts: DocumentArtifacts) -> None:
+        if not self._ensure_entry(key):
+            return
+        meta_path = os.path.join(self._entry_dir(key), "meta.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            meta["flags"] = artifacts.flags
+            self._write_meta(meta_path, meta)
+        except (OSError, ValueError):
+            # entrada removida por outro processo no meio do caminho
+            return
+        self._refresh_size(key)
+
+    def _select_evictions(self) -> List[str]:
+        # chamado com o lock; nunca remove a entrada recém-gravada
+        evict = []
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            evict.append(key)
+        return evict
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+            self.misses += 1
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    @staticmethod
+    def _digest_file(version: str) -> str:
+        return f"digest-{version}.txt"
+
+    def get_digest(self, key: str, version: str) -> Optional[str]:
+        """Digest do documento para a versão de prompt `version`, se existir."""
+        path = os.path.join(self._entry_dir(key), self._digest_file(version))
+        try:
+            with open(path, encoding="utf-8") as f:
+                digest = f.read()
+        except OSError:
+            with self._lock:
+                self.digest_misses += 1
+            return None
+        with self._lock:
+            self.digest_hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return digest
+
+    def put_digest(self, key: str, version: str, digest: str) -> None:
+        """
+        Grava o digest do documento (cria a entrada se ela não existir).
+        """
+        entry = self._entry_dir(key)
+        if not self._ensure_entry(key):
+            return
+        path = os.path.join(entry, self._digest_file(version))
+        try:
+            fd, tmp = tempfile.mkstemp(dir=entry, prefix=".digest-")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(digest)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._refresh_size(key)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], DocumentArtifacts],
+    ) -> DocumentArtifacts:
+        artifacts = self.get(key)
+        if artifacts is None:
+            artifacts = compute()
+            self.put(key, artifacts)
+        return artifacts
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hit_rate, 4),
+                "digest_hits": self.digest_hits,
+                "digest_misses": self.digest_misses,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+
+def build_document_store() -> Optional[DocumentStore]:
+    """
+    Cria o store a partir da config (DOC_STORE_DIR, DOC_STORE_MAX_MB).
+    Retorna None se DOC_STORE_ENABLED estiver desligado.
+    """
+    if not DOC_STORE_ENABLED:
+        return None
+    return DocumentStore(DOC_STORE_DIR, max_bytes=DOC_STORE_MAX_MB * 1024 * 1024)
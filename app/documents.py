@@ -0,0 +1,82 @@
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+
+# indícios procurados no texto dos documentos (texto normalizado, minúsculo)
+FLAG_PATTERNS: Dict[str, re.Pattern] = {
+    # "substabeleço, sem reserva de poderes" / "substabelecimento sem reserva"
+    "substabelecimento_sem_reserva": re.compile(r"substabele\w*[\s,;:]+sem[\s,;:]+reserva"),
+    "substabelecimento_com_reserva": re.compile(r"substabele\w*[\s,;:]+com[\s,;:]+reserva"),
+    "transito_em_julgado": re.compile(r"tr[aâ]nsit\w*\s+em\s+julgado"),
+    "cumprimento_de_sentenca": re.compile(r"cumprimento\s+de\s+senten[cç]a|fase\s+de\s+execu[cç][aã]o"),
+    "obito": re.compile(r"[oó]bito|falec\w+"),
+    "habilitacao_sucessores": re.compile(r"habilita[cç][aã]o\s+d[eo]s?\s+(herdeiros|sucessores)"),
+    "honorarios": re.compile(r"honor[aá]rios"),
+}
+
+FLAG_LABELS: Dict[str, str] = {
+    "substabelecimento_sem_reserva": "substabelecimento sem reserva de poderes",
+    "substabelecimento_com_reserva": "substabelecimento com reserva de poderes",
+    "transito_em_julgado": "menciona trânsito em julgado",
+    "cumprimento_de_sentenca": "cumprimento de sentença / execução",
+    "obito": "menciona óbito",
+    "habilitacao_sucessores": "habilitação de herdeiros/sucessores",
+    "honorarios": "menciona honorários",
+}
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalização usada para o hash: Unicode NFC e espaços colapsados,
+    para que a mesma peça com quebras de linha diferentes caia na mesma chave.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def chunk_boundaries(
+    text: str,
+    size: int,
+    overlap: int = 0,
+) -> List[Tuple[int, int]]:
+    """
+    Limites (início, fim) dos chunks sobre o texto normalizado,
+    cortando preferencialmente em espaço.
+    """
+    bounds: List[Tuple[int, int]] = []
+    start, n = 0, len(text)
+    while start < n:
+        end = min(start + size, n)
+        if end < n:
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut != -1:
+                end = cut
+        bounds.append((start, end))
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+    return bounds
+
+
+# negação logo antes do termo ("não transitou em julgado", "ainda não houve óbito")
+NEGATION = re.compile(r"\b(n[aã]o|nem|sem|inexist\w*|aus[eê]ncia\s+de)\b[^.;]{0,25}$")
+
+
+def extract_flags(text: str) -> List[str]:
+    """
+    Indícios por regex. Ocorrências precedidas de negação são ignoradas;
+    ainda assim é heurística (ver DOC_FLAGS_ENABLED).
+    """
+    lower = text.lower()
+    flags = []
+    for name, pattern in FLAG_PATTERNS.items():
+        for m in pattern.finditer(lower):
+            if not NEGATION.search(lower[max(0, m.start() - 40):m.start()]):
+                flags.append(name)
+                break
+    return flags
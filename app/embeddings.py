@@ -0,0 +1,187 @@
+import inspect
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BACKEND,
+    ONNX_CACHE_DIR,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_NUM_THREADS,
+)
+
+
+EMBEDDING_BACKENDS = {"torch", "onnx", "onnx-int8"}
+
+
+def onnx_model_dir(model_name: str, cache_dir: str = ONNX_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = False) -> str:
+    """
+    Exporta o encoder (ex.: all-MiniLM-L6-v2) para ONNX em `out_dir`,
+    junto com o tokenizer. Com `quantize=True` gera também a versão int8
+    (quantização dinâmica dos pesos). Retorna o caminho do .onnx a usar.
+
+    Tudo é gerado em arquivos temporários e movido com os.replace; o
+    model.onnx é o último a entrar, então um export interrompido (ou
+    dois workers exportando ao mesmo tempo) nunca deixa arquivo parcial.
+    """
+    # imports pesados só na exportação
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        os.makedirs(out_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+
+        # exportador TorchScript: o dynamo (padrão em torch recentes) exige onnxscript
+        export_kwargs = {}
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+
+        tmp_dir = tempfile.mkdtemp(dir=out_dir, prefix=".export-")
+        try:
+            dummy = tokenizer(["exemplo de texto"], return_tensors="pt")
+            input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    tuple(dummy[n] for n in input_names),
+                    os.path.join(tmp_dir, "model.onnx"),
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes={
+                        **{n: {0: "batch", 1: "seq"} for n in input_names},
+                        "last_hidden_state": {0: "batch", 1: "seq"},
+                    },
+                    opset_version=14,
+                    **export_kwargs,
+                )
+            tokenizer.save_pretrained(tmp_dir)
+
+            # tokenizer primeiro, modelo por último (marca o export como completo)
+            names = sorted(os.listdir(tmp_dir), key=lambda n: n == "model.onnx")
+            for name in names:
+                os.replace(os.path.join(tmp_dir, name), os.path.join(out_dir, name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".int8-", suffix=".onnx")
+        os.close(fd)
+        try:
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Embeddings sentence-transformers rodando em ONNX Runtime (CPU).
+
+    Reproduz o pipeline do all-MiniLM-L6-v2: mean pooling com máscara
+    de atenção + normalização L2. Processa em lotes de `batch_size`
+    com um número fixo de threads.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        quantize: bool = False,
+        cache_dir: str = ONNX_CACHE_DIR,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        num_threads: int = EMBEDDING_NUM_THREADS,
+        max_length: int = 256,
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        out_dir = onnx_model_dir(model_name, cache_dir)
+        model_path = export_onnx(model_name, out_dir, quantize=quantize)
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = num_threads
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(out_dir)
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np",
+        )
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+
+        # mean pooling ignorando padding
+        mask = enc["attention_mask"][..., None].astype(np.float32)
+        summed = (hidden * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # ordenar por tamanho reduz padding dentro de cada lote
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            vecs = self._embed_batch([texts[i] for i in idx])
+            for i, v in zip(idx, vecs):
+                out[i] = v
+        return np.stack(out).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def build_embeddings(backend: Optional[str] = None, model_name: Optional[str] = None) -> Embeddings:
+    """
+    Cria o backend de embeddings configurado em EMBEDDING_BACKEND:
+    - "torch": HuggingFaceEmbeddings (sentence-transformers);
+    - "onnx" / "onnx-int8": OnnxEmbeddings (ONNX Runtime, fp32 ou int8).
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    model_name = model_name or EMBEDDING_MODEL_NAME
+
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend in {"onnx", "onnx-int8"}:
+        return OnnxEmbeddings(model_name=model_name, quantize=backend == "onnx-int8")
+    raise ValueError(f"EMBEDDING_BACKEND inválido: {backend!r} (use {sorted(EMBEDDING_BACKENDS)})")
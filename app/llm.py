@@ -1,8 +1,12 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+import threading
+import time
+from typing import Optional
+
+from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline, StoppingCriteria
 from langchain_huggingface import HuggingFacePipeline
 import torch
 
-from .config import LOCAL_LLM_MODEL
+from .config import LOCAL_LLM_MODEL, DIGEST_BATCH_SIZE
 
 
 def build_local_llm(model_name: str | None = None) -> HuggingFacePipeline:
@@ -14,6 +18,10 @@ def build_local_llm(model_name: str | None = None) -> HuggingFacePipeline:
     model_name = model_name or LOCAL_LLM_MODEL
 
     tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # geração em lote (digests): decoder-only precisa de padding à esquerda
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
     model = AutoModelForCausalLM.from_pretrained(
         model_name,
         device_map="auto",
@@ -27,7 +35,32 @@ def build_local_llm(model_name: str | None = None) -> HuggingFacePipeline:
         max_new_tokens=256,   # suficiente
         do_sample=False,
         return_full_text=False,
+        batch_size=DIGEST_BATCH_SIZE,  # listas de prompts viram lotes reais no generate
     )
 
-    llm = HuggingFacePipeline(pipeline=gen_pipeline)
+    llm = HuggingFacePipeline(pipeline=gen_pipeline, batch_size=DIGEST_BATCH_SIZE)
     return llm
+
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    """
+    Interrompe a geração quando o deadline (time.monotonic) passa
+    ou quando o cancel_event é sinalizado (ex.: cliente desconectou).
+    `triggered` indica se a geração foi abortada por este critério.
+    """
+
+    def __init__(self, deadline: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        self.deadline = deadline
+        self.cancel_event = cancel_event
+        self.triggered = False
+
+    def expired(self) -> bool:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def __call__(self, input_ids, scores, **kwargs):
+        stop = self.expired()
+        if stop:
+            self.triggered = True
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
@@ -40,6 +40,10 @@ class DecisionResult(BaseModel):
     rationale: str
     citacoes: List[str]
 
+    # True quando o deadline estourou ou a requisição foi cancelada antes
+    # de o modelo concluir (decision fica "incomplete" sem análise da política)
+    timed_out: bool = False
+
     # metadados opcionais pra auditoria
     model_name: Optional[str] = None
     prompt_version: Optional[str] = None
@@ -0,0 +1,283 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Callable, Optional, Tuple
+
+from .config import (
+    PROFILING_ENABLED,
+    PROFILE_DIR,
+    PROFILE_SAMPLE_INTERVAL_S,
+    TRACEMALLOC_FRAMES,
+)
+
+
+MB = 1024 * 1024
+
+
+def _torch_memory_stats() -> Optional[dict]:
+    """
+    Estatísticas de memória do torch, se ele já estiver carregado
+    (não importa torch só para isso).
+    """
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return None
+    stats = {"cuda_available": torch.cuda.is_available()}
+    if stats["cuda_available"]:
+        stats.update({
+            "allocated_mb": round(torch.cuda.memory_allocated() / MB, 2),
+            "reserved_mb": round(torch.cuda.memory_reserved() / MB, 2),
+            "max_allocated_mb": round(torch.cuda.max_memory_allocated() / MB, 2),
+        })
+    return stats
+
+
+# intervalo de leitura do RSS durante uma decisão (pico nativo)
+RSS_SAMPLE_INTERVAL_S = 0.01
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    """Campo de /proc/self/status em MB (ex.: VmRSS, VmHWM); None fora do Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 2)
+    except OSError:
+        pass
+    return None
+
+
+def _rss_mb() -> Optional[float]:
+    return _proc_status_mb("VmRSS")
+
+
+def _rss_hwm_mb() -> Optional[float]:
+    """
+    High-water mark do RSS do processo. Usa VmHWM e, sem /proc,
+    ru_maxrss (KB no Linux, bytes no macOS).
+    """
+    hwm = _proc_status_mb("VmHWM")
+    if hwm is not None:
+        return hwm
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maxrss / (MB if sys.platform == "darwin" else 1024), 2)
+
+
+class RssSampler:
+    """
+    Lê o RSS periodicamente numa thread e guarda o maior valor visto.
+    Capta alocações nativas (torch, tokenizers, onnxruntime) que o
+    tracemalloc não enxerga, e que nem sempre movem o VmHWM.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.start_mb = _rss_mb()
+        self.peak_mb = self.start_mb
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        rss = _rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        if self.start_mb is not None:
+            self._thread.start()
+
+    def stop(self) -> Optional[float]:
+        """Encerra e devolve o pico acima do RSS inicial, em MB."""
+        if self.start_mb is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return round(self.peak_mb - self.start_mb, 2)
+
+
+class StackSampler:
+    """
+    Profiler de CPU por amostragem: a cada `interval` segundos lê a pilha
+    da thread alvo e conta pilhas no formato "folded"
+    (`f1;f2;f3 <n>`), aceito por flamegraph.pl e speedscope.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return name.replace(";", ":")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class Profiler:
+    """
+    Superfície de profiling opt-in (PROFILING_ENABLED):
+    - diff de snapshots do tracemalloc + memória do torch (memory_report);
+    - perfis de CPU por amostragem das próximas N chamadas (arm_cpu_profile);
+    - pico de memória por requisição, Python e nativa (run).
+
+    Quando desligado não existe instância: nada disso roda.
+    """
+
+    def __init__(
+        self,
+        profile_dir: str = PROFILE_DIR,
+        sample_interval: float = PROFILE_SAMPLE_INTERVAL_S,
+        frames: int = TRACEMALLOC_FRAMES,
+    ):
+        self.profile_dir = profile_dir
+        self.sample_interval = sample_interval
+        self.frames = frames
+        self.recent: deque = deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._profiles_left = 0
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._snapshot = tracemalloc.take_snapshot()
+
+    def arm_cpu_profile(self, n: int) -> None:
+        """Perfila as próximas `n` chamadas de run()."""
+        with self._lock:
+            self._profiles_left = max(n, 0)
+
+    @property
+    def profiles_left(self) -> int:
+        return self._profiles_left
+
+    def _take_profile_slot(self) -> bool:
+        with self._lock:
+            if self._profiles_left <= 0:
+                return False
+            self._profiles_left -= 1
+            return True
+
+    def run(self, fn: Callable, *args, **kwargs) -> Tuple[object, dict]:
+        """
+        Executa `fn` medindo latência e pico de memória:
+        - peak_mem_mb: alocações Python (tracemalloc);
+        - rss_peak_mb: pico do RSS amostrado acima do início (inclui memória nativa);
+        - rss_hwm_delta_mb: quanto o high-water mark do processo subiu;
+        - cuda_peak_mb: se houver GPU.
+        Os picos são globais ao processo: com decisões concorrentes a
+        atribuição é aproximada.
+        """
+        sampler = None
+        if self._take_profile_slot():
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+
+        torch = sys.modules.get("torch")
+        cuda = torch is not None and torch.cuda.is_available()
+        if cuda:
+            torch.cuda.reset_peak_memory_stats()
+        hwm_before = _rss_hwm_mb()
+        rss = RssSampler()
+        rss.start()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            stats = {
+                "decide_latency_s": round(elapsed, 3),
+                "peak_mem_mb": round((peak - before) / MB, 2),
+                "rss_peak_mb": rss.stop(),
+            }
+            hwm_after = _rss_hwm_mb()
+            if hwm_before is not None and hwm_after is not None:
+                stats["rss_hwm_delta_mb"] = round(hwm_after - hwm_before, 2)
+            if cuda:
+                stats["cuda_peak_mb"] = round(torch.cuda.max_memory_allocated() / MB, 2)
+            if sampler is not None:
+                sampler.stop()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                path = os.path.join(self.profile_dir, f"decide-{time.strftime('%Y%m%d-%H%M%S')}-{id(sampler):x}.folded")
+                sampler.write_folded(path)
+                stats["cpu_profile"] = path
+            self.recent.append(stats)
+        return result, stats
+
+    def memory_report(self, top: int = 20) -> dict:
+        """
+        Maiores variações de alocação desde o relatório anterior
+        (ou desde o início), agrupadas por linha de código.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+        diff = snapshot.compare_to(previous, "lineno")
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "rss_mb": _rss_mb(),
+            "traced_current_mb": round(current / MB, 2),
+            "traced_peak_mb": round(peak / MB, 2),
+            "top_diff": [
+                {
+                    "location": str(stat.traceback[0]),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in diff[:top]
+            ],
+            "torch": _torch_memory_stats(),
+            "recent_requests": list(self.recent),
+        }
+
+    def list_profiles(self) -> list:
+        if not os.path.isdir(self.profile_dir):
+            return []
+        return sorted(f for f in os.listdir(self.profile_dir) if f.endswith(".folded"))
+
+
+def build_profiler() -> Optional[Profiler]:
+    """Profiler se PROFILING_ENABLED, senão None (custo zero)."""
+    if not PROFILING_ENABLED:
+        return None
+    return Profiler()
@@ -1,15 +1,14 @@
 from typing import List
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
 from .policy_store import get_policy_chunks, PolicyChunk
-from .config import EMBEDDING_MODEL_NAME
+from .embeddings import build_embeddings
 
 
 def build_policy_vectorstore() -> FAISS:
     """
     Cria um vectorstore FAISS com as políticas (POL-1...POL-8)
-    usando embeddings locais da HuggingFace.
+    usando embeddings locais (backend em EMBEDDING_BACKEND).
     """
     policy_chunks: List[PolicyChunk] = get_policy_chunks()
 
@@ -19,7 +18,7 @@ def build_policy_vectorstore() -> FAISS:
         for c in policy_chunks
     ]
 
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    embeddings = build_embeddings()
     vectorstore = FAISS.from_texts(
         texts=texts,
         embedding=embeddings,
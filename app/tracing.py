@@ -0,0 +1,240 @@
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import TRACING_MODE, TRACING_SAMPLE_RATE, TRACE_PATH, TRACE_BUFFER_SIZE
+
+
+TRACING_MODES = {"off", "sampled", "full"}
+
+
+class Span:
+    """
+    Registro de uma chamada (ex.: decide): tempos por etapa + atributos
+    livres (prompt, saída bruta do modelo, etc.).
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.start_ts = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_s: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self.attributes: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - t0, 6)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.duration_s = round(time.perf_counter() - self._t0, 6)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start_ts": self.start_ts,
+            "duration_s": self.duration_s,
+            "stages": self.stages,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """
+    Span usado quando a chamada não é amostrada: não mede nem guarda nada.
+    """
+
+    trace_id = None
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class LocalTraceExporter:
+    """
+    Escreve spans em disco numa thread de fundo.
+
+    O buffer é limitado: se a escrita não acompanhar, os spans novos são
+    descartados (contados em `dropped`) em vez de bloquear a requisição.
+    O formato é escolhido pela extensão: .db/.sqlite -> SQLite, senão JSON lines.
+    """
+
+    def __init__(self, path: str, max_buffer: int = 1000):
+        self.path = path
+        self.use_sqlite = os.path.splitext(path)[1].lower() in {".db", ".sqlite", ".sqlite3"}
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=max_buffer)
+        self._closing = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, record: dict) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        # escreve o que já está no buffer e encerra; nunca bloqueia além de `timeout`
+        self._closing.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            # a thread encerra sozinha ao ver _closing com o buffer vazio
+            pass
+        self._thread.join(timeout)
+
+    def _drain(self, first: dict) -> Tuple[List[dict], bool]:
+        """Junta até 100 spans; o bool indica que a sentinela foi consumida."""
+        batch = [first]
+        while len(batch) < 100:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = None
+        if self.use_sqlite:
+            conn = sqlite3.connect(self.path)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spans ("
+                "trace_id TEXT PRIMARY KEY, name TEXT, start_ts REAL, "
+                "duration_s REAL, stages TEXT, attributes TEXT)"
+            )
+            conn.commit()
+
+        try:
+            stop = False
+            while not stop:
+                try:
+                    item = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    if self._closing.is_set():
+                        break
+                    continue
+                if item is None:
+                    break
+                batch, stop = self._drain(item)
+                try:
+                    self._write(conn, batch)
+                    self.exported += len(batch)
+                except Exception:
+                    # tracing nunca deve derrubar o serviço
+                    self.dropped += len(batch)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _write(self, conn: Optional[sqlite3.Connection], batch: List[dict]) -> None:
+        if conn is not None:
+            conn.executemany(
+                "INSERT OR REPLACE INTO spans VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        r["trace_id"],
+                        r["name"],
+                        r["start_ts"],
+                        r["duration_s"],
+                        json.dumps(r["stages"]),
+                        json.dumps(r["attributes"], ensure_ascii=False, default=str),
+                    )
+                    for r in batch
+                ],
+            )
+            conn.commit()
+            return
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            for r in batch:
+                f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+
+
+class Tracer:
+    """
+    Decide se uma chamada é rastreada (off / sampled / full) e envia
+    os spans finalizados ao exporter.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        sample_rate: float = 0.1,
+        exporter: Optional[LocalTraceExporter] = None,
+    ):
+        if mode not in TRACING_MODES:
+            raise ValueError(f"TRACING_MODE inválido: {mode!r} (use {sorted(TRACING_MODES)})")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and self.exporter is not None
+
+    def start_span(self, name: str):
+        if not self.enabled:
+            return NOOP_SPAN
+        if self.mode == "sampled" and random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        return Span(name)
+
+    def finish(self, span) -> None:
+        if span is NOOP_SPAN:
+            return
+        span.end()
+        self.exporter.export(span.to_dict())
+
+
+def build_tracer(
+    mode: Optional[str] = None,
+    sample_rate: Optional[float] = None,
+    path: Optional[str] = None,
+) -> Tracer:
+    """
+    Cria o tracer a partir da config (TRACING_MODE, TRACING_SAMPLE_RATE, TRACE_PATH).
+    Com tracing desligado nenhuma thread/arquivo é criado.
+    """
+    mode = (mode or TRACING_MODE).lower()
+    if mode not in TRACING_MODES:
+        raise ValueError(f"TRACING_MODE inválido: {mode!r} (use {sorted(TRACING_MODES)})")
+    sample_rate = TRACING_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    exporter = None
+    if mode != "off":
+        exporter = LocalTraceExporter(path or TRACE_PATH, max_buffer=TRACE_BUFFER_SIZE)
+    return Tracer(mode=mode, sample_rate=sample_rate, exporter=exporter)
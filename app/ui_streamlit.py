@@ -1,16 +1,39 @@
+import csv
+import io
 import json
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
 
-from config import API_BASE_URL 
+from config import API_BASE_URL, UI_MAX_CONCURRENCY, UI_HEALTH_TTL_S
 
+# tentativas extras quando a API responde 503/429 (fila cheia)
+MAX_RETRIES_ON_BUSY = 2
 
+BATCH_COLUMNS = ["arquivo", "numeroProcesso", "decision", "timed_out", "citacoes", "rationale", "error"]
 
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Sessão HTTP compartilhada entre reruns (keep-alive), com pool
+    dimensionado para o envio concorrente em lote.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=UI_MAX_CONCURRENCY)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data(ttl=UI_HEALTH_TTL_S, show_spinner=False)
 def check_health() -> bool:
     try:
-        resp = requests.get(f"{API_BASE_URL}/health", timeout=3)
+        resp = get_http_session().get(f"{API_BASE_URL}/health", timeout=3)
         return resp.status_code == 200
     except Exception:
         return False
@@ -31,18 +54,38 @@ def call_validate_process(raw_json: str) -> dict:
             "error": f"JSON inválido: {e}",
         }
 
-    try:
-        resp = requests.post(
-            f"{API_BASE_URL}/validate_process",
-            json=payload,
-            timeout=200,
-        )
-    except Exception as e:
-        return {
-            "ok": False,
-            "data": None,
-            "error": f"Erro ao chamar API: {e}",
-        }
+    return post_processo(get_http_session(), payload)
+
+
+def post_processo(session: requests.Session, payload: dict) -> dict:
+    """
+    POST de um processo já parseado. Se a API estiver com a fila cheia
+    (503/429), espera o Retry-After e tenta de novo.
+    Mesmo formato de retorno de call_validate_process.
+
+    Recebe a sessão pronta: pode rodar em threads sem ScriptRunContext.
+    """
+    for attempt in range(MAX_RETRIES_ON_BUSY + 1):
+        try:
+            resp = session.post(
+                f"{API_BASE_URL}/validate_process",
+                json=payload,
+                timeout=200,
+            )
+        except Exception as e:
+            return {
+                "ok": False,
+                "data": None,
+                "error": f"Erro ao chamar API: {e}",
+            }
+
+        if resp.status_code not in (429, 503) or attempt == MAX_RETRIES_ON_BUSY:
+            break
+        try:
+            wait_s = float(resp.headers.get("Retry-After", "5"))
+        except ValueError:
+            wait_s = 5.0
+        time.sleep(min(wait_s, 60))
 
     if resp.status_code != 200:
         msg = f"Erro na API ({resp.status_code}): {resp.text}"
@@ -64,6 +107,104 @@ def call_validate_process(raw_json: str) -> dict:
     return {"ok": True, "data": data, "error": None}
 
 
+def parse_uploaded_files(files) -> List[dict]:
+    """
+    Lê arquivos .json (objeto ou lista de objetos) e .jsonl (um processo por linha).
+    Retorna itens {"arquivo", "payload", "error"} na ordem do upload.
+    """
+    items: List[dict] = []
+    for f in files:
+        text = f.getvalue().decode("utf-8-sig")
+
+        if f.name.lower().endswith(".jsonl"):
+            for lineno, line in enumerate(text.splitlines(), start=1):
+                if not line.strip():
+                    continue
+                label = f"{f.name}:{lineno}"
+                try:
+                    items.append({"arquivo": label, "payload": json.loads(line), "error": None})
+                except json.JSONDecodeError as e:
+                    items.append({"arquivo": label, "payload": None, "error": f"JSON inválido: {e}"})
+            continue
+
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            items.append({"arquivo": f.name, "payload": None, "error": f"JSON inválido: {e}"})
+            continue
+
+        if isinstance(data, list):
+            for i, payload in enumerate(data, start=1):
+                items.append({"arquivo": f"{f.name}[{i}]", "payload": payload, "error": None})
+        else:
+            items.append({"arquivo": f.name, "payload": data, "error": None})
+    return items
+
+
+def _batch_row(item: dict, resp: Optional[dict]) -> dict:
+    payload = item["payload"] if isinstance(item["payload"], dict) else {}
+    row = {
+        "arquivo": item["arquivo"],
+        "numeroProcesso": payload.get("numeroProcesso", ""),
+        "decision": "",
+        "timed_out": "",
+        "citacoes": "",
+        "rationale": "",
+        "error": item["error"] or "",
+    }
+    if resp is None:
+        return row
+    if not resp["ok"]:
+        row["error"] = resp["error"]
+        return row
+    data = resp["data"]
+    row["decision"] = data.get("decision", "")
+    row["timed_out"] = bool(data.get("timed_out", False))
+    row["citacoes"] = ", ".join(data.get("citacoes", []) or [])
+    row["rationale"] = data.get("rationale", "")
+    return row
+
+
+def run_batch(items: List[dict], table_placeholder, progress) -> List[dict]:
+    """
+    Envia os processos em paralelo (até UI_MAX_CONCURRENCY) pela sessão
+    compartilhada e atualiza a tabela conforme os resultados chegam.
+    """
+    rows: List[Optional[dict]] = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        if item["error"]:
+            rows[i] = _batch_row(item, None)
+        else:
+            pending.append(i)
+
+    # cache_resource só funciona na thread do script: a sessão é obtida aqui
+    session = get_http_session()
+    done = len(items) - len(pending)
+    with ThreadPoolExecutor(max_workers=UI_MAX_CONCURRENCY) as pool:
+        futures = {pool.submit(post_processo, session, items[i]["payload"]): i for i in pending}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            rows[i] = _batch_row(items[i], fut.result())
+            done += 1
+            progress.progress(done / len(items), text=f"{done}/{len(items)} processos")
+            table_placeholder.dataframe(
+                [r for r in rows if r is not None],
+                use_container_width=True,
+                hide_index=True,
+            )
+    return rows
+
+
+def rows_to_csv(rows: List[dict]) -> bytes:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=BATCH_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    # BOM para o Excel reconhecer UTF-8
+    return buf.getvalue().encode("utf-8-sig")
+
+
 
 def render_header():
     st.set_page_config(
@@ -179,6 +320,9 @@ def render_sidebar():
         1. Cole um JSON de processo no painel à direita.  
         2. Clique em **Validar processo**.  
         3. Veja a decisão da IA, justificativa e regras utilizadas.
+
+        Para vários processos, use a aba **Lote** e envie arquivos
+        `.json` ou `.jsonl`; o resultado pode ser exportado em CSV.
         """
     )
 
@@ -298,10 +442,51 @@ def render_input_section():
     return raw_json, clicked
 
 
-def main():
-    render_header()
-    render_sidebar()
+def render_batch_section():
+    st.markdown("### 📦 Validação em lote")
+
+    files = st.file_uploader(
+        "Arquivos de processos (.json com objeto ou lista, ou .jsonl com um processo por linha)",
+        type=["json", "jsonl"],
+        accept_multiple_files=True,
+    )
+    items = parse_uploaded_files(files) if files else []
+
+    col_btn, col_info = st.columns([0.3, 0.7])
+    with col_btn:
+        clicked = st.button(
+            "✅ Validar lote",
+            type="primary",
+            use_container_width=True,
+            disabled=not items,
+        )
+    with col_info:
+        st.caption(
+            f"{len(items)} processo(s) carregado(s). "
+            f"Envio com até {UI_MAX_CONCURRENCY} requisições simultâneas."
+        )
 
+    progress = st.empty()
+    table = st.empty()
+
+    if clicked:
+        bar = progress.progress(0.0, text=f"0/{len(items)} processos")
+        st.session_state["batch_rows"] = run_batch(items, table, bar)
+
+    rows = st.session_state.get("batch_rows")
+    if not rows:
+        return
+
+    table.dataframe(rows, use_container_width=True, hide_index=True)
+    st.download_button(
+        "⬇️ Exportar CSV",
+        data=rows_to_csv(rows),
+        file_name="validacao_lote.csv",
+        mime="text/csv",
+    )
+
+
+def render_single_section():
     # layout principal
     col_input, col_output = st.columns([0.55, 0.45])
 
@@ -325,5 +510,16 @@ def main():
             )
 
 
+def main():
+    render_header()
+    render_sidebar()
+
+    tab_single, tab_batch = st.tabs(["Processo único", "Lote"])
+    with tab_single:
+        render_single_section()
+    with tab_batch:
+        render_batch_section()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,114 @@
+"""
+Benchmark dos backends de embeddings (torch vs ONNX fp32 vs ONNX int8).
+
+Mede tempo de export (só ONNX; zero com o cache já preenchido), tempo
+de carga, embeddings/s e concordância de retrieval com o
+backend torch (sobreposição do top-k e similaridade cosseno dos vetores).
+
+    python -m bench.bench_embeddings --n-docs 512 --k 3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.config import EMBEDDING_MODEL_NAME
+from app.embeddings import build_embeddings, export_onnx, onnx_model_dir
+from app.policy_store import get_policy_chunks
+
+
+QUERIES = [
+    "Processo trabalhista com condenação transitada em julgado",
+    "Valor da condenação de R$ 500,00 em ação cível",
+    "Óbito do autor sem habilitação de herdeiros no inventário",
+    "Substabelecimento sem reserva de poderes juntado aos autos",
+    "Falta certidão de trânsito em julgado",
+    "Honorários sucumbenciais e contratuais informados",
+    "Cumprimento de sentença em fase de execução",
+    "Valor da condenação não informado",
+]
+
+
+def build_corpus(n_docs: int):
+    base = [f"{c.title}. {c.text}" for c in get_policy_chunks()]
+    corpus = []
+    i = 0
+    while len(corpus) < n_docs:
+        # variações com tamanhos diferentes para exercitar o padding
+        corpus.append(" ".join([base[i % len(base)]] * (1 + i % 4)))
+        i += 1
+    return corpus
+
+
+def run(backend: str, corpus, k: int) -> dict:
+    # export/quantização é custo único: fora do tempo de carga
+    export_s = 0.0
+    if backend.startswith("onnx"):
+        t0 = time.perf_counter()
+        export_onnx(
+            EMBEDDING_MODEL_NAME,
+            onnx_model_dir(EMBEDDING_MODEL_NAME),
+            quantize=backend == "onnx-int8",
+        )
+        export_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    emb = build_embeddings(backend=backend)
+    emb.embed_query("aquecimento")
+    load_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    doc_vecs = np.asarray(emb.embed_documents(corpus), dtype=np.float32)
+    docs_per_s = len(corpus) / (time.perf_counter() - t0)
+
+    query_vecs = np.asarray([emb.embed_query(q) for q in QUERIES], dtype=np.float32)
+
+    policy_vecs = np.asarray(
+        emb.embed_documents([c.text for c in get_policy_chunks()]), dtype=np.float32
+    )
+    topk = np.argsort(-(query_vecs @ policy_vecs.T), axis=1)[:, :k]
+
+    return {
+        "backend": backend,
+        "export_s": round(export_s, 2),
+        "load_s": round(load_s, 2),
+        "docs_per_s": round(docs_per_s, 1),
+        "doc_vecs": doc_vecs,
+        "topk": topk,
+    }
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-docs", type=int, default=512)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.n_docs)
+    results = [run(b, corpus, args.k) for b in args.backends]
+    ref = next((r for r in results if r["backend"] == "torch"), results[0])
+
+    for r in results:
+        overlap = np.mean([
+            len(set(a) & set(b)) / args.k for a, b in zip(r["topk"], ref["topk"])
+        ])
+        cosine = float(np.mean(np.sum(
+            _normalize(r["doc_vecs"]) * _normalize(ref["doc_vecs"]), axis=1
+        )))
+        print({
+            "backend": r["backend"],
+            "export_s": r["export_s"],
+            "load_s": r["load_s"],
+            "docs_per_s": r["docs_per_s"],
+            f"top{args.k}_overlap_vs_{ref['backend']}": round(float(overlap), 3),
+            f"cosine_vs_{ref['backend']}": round(cosine, 4),
+        })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark do overhead de tracing em DecisionEngine.decide.
+
+Usa LLM e retriever falsos (respostas instantâneas) para isolar o custo
+do tracing: off vs sampled vs full.
+
+    python -m bench.bench_tracing --n 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.decision_service import DecisionEngine
+from app.models import Processo, Documento, Movimento
+from app.policy_store import get_policy_chunks
+from app.tracing import build_tracer
+
+
+class FakeLLM:
+    def invoke(self, prompt: str) -> str:
+        return json.dumps({"decision": "approved", "rationale": "ok", "citacoes": ["POL-1"]})
+
+
+class FakeRetriever:
+    def __init__(self):
+        self.docs = [
+            SimpleNamespace(page_content=c.text, metadata={"id": c.id, "title": c.title})
+            for c in get_policy_chunks()[:4]
+        ]
+
+    def invoke(self, query: str):
+        return self.docs
+
+
+def sample_processo() -> Processo:
+    now = datetime(2024, 11, 18, 23, 15)
+    return Processo(
+        numeroProcesso="0000000-00.0000.0.00.0000",
+        classe="Cumprimento de Sentença",
+        orgaoJulgador="1ª Vara Cível",
+        ultimaDistribuicao=now,
+        segredoJustica=False,
+        justicaGratuita=True,
+        siglaTribunal="TJSP",
+        esfera="Cível",
+        valorCondenacao=15000.0,
+        documentos=[
+            Documento(id=str(i), dataHoraJuntada=now, nome=f"Documento {i}", texto="texto " * 200)
+            for i in range(5)
+        ],
+        movimentos=[Movimento(dataHora=now, descricao=f"Movimento {i}") for i in range(10)],
+    )
+
+
+def run(mode: str, n: int, sample_rate: float, path: str) -> dict:
+    tracer = build_tracer(mode=mode, sample_rate=sample_rate, path=path)
+    engine = DecisionEngine(llm=FakeLLM(), retriever=FakeRetriever(), tracer=tracer)
+    processo = sample_processo()
+
+    for _ in range(50):  # aquecimento
+        engine.decide(processo)
+
+    latencies = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        engine.decide(processo)
+        latencies.append(time.perf_counter() - t0)
+
+    dropped = 0
+    if tracer.exporter is not None:
+        tracer.exporter.close()
+        dropped = tracer.exporter.dropped
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "mean_us": round(statistics.mean(latencies) * 1e6, 1),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+        "dropped": dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--sqlite", action="store_true", help="exporta para SQLite em vez de JSONL")
+    args = parser.parse_args()
+
+    ext = ".db" if args.sqlite else ".jsonl"
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("off", "sampled", "full"):
+            path = os.path.join(tmp, f"{mode}{ext}")
+            print(run(mode, args.n, args.sample_rate, path))
+
+
+if __name__ == "__main__":
+    main()